@@ -28,10 +28,11 @@ contains metadata.
 #
 # For more information, please refer to <https://unlicense.org>
 #
+import multiprocessing
 import os
 import sys
 from typing import Dict, List, Optional, Union
-from reader import read_file
+from reader import read_files
 
 __version__ = '0.1.0'
 
@@ -75,6 +76,9 @@ def print_help() -> None:
     print('    -t, --text                 Export text files only.')
 
 if __name__ == '__main__':
+    # Files may be read in worker processes, which a frozen executable
+    # has to hand off to here rather than running the program again.
+    multiprocessing.freeze_support()
     print_preamble()
 
     # Check the passed arguments to ensure that there's not any.
@@ -131,15 +135,13 @@ if __name__ == '__main__':
                 ARGUMENTS['text_only'] = True
     # Get a list of aco files in the input directory.
     files: list[str] = [
-        f for f in os.listdir(ARGUMENTS['input_directory'])
-            if os.path.isfile(ARGUMENTS['input_directory'] + f)
-                and f[-3:] == 'aco'
+        e.name for e in os.scandir(ARGUMENTS['input_directory'])
+            if e.name.endswith('.aco') and e.is_file()
     ]
     if (len(files) > 0):
         vprint(f'Found {len(files)} .aco files to process in input directory.')
     else:
         print('aco_reader: unable to find any .aco files in the input directory.')
         sys.exit(0)
-    for _f in files:
-        read_file(_f, xargs=ARGUMENTS)
+    read_files(files, xargs=ARGUMENTS)
  
\ No newline at end of file
@@ -28,115 +28,28 @@ encoded inside.
 #
 # For more information, please refer to <https://unlicense.org>
 #
-from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from operator import mul
 import os
-import sys
-from typing import Optional
-from ctypes import c_uint16, c_int16, c_uint32, pointer, memmove, sizeof
+import struct
+from typing import Callable, Dict, Iterator, Optional, Tuple
 
 
-def read_uint16(file: BytesIO) -> int:
-    """ Reads an unsigned 16-bit integer from `file` and returns it as
-    an int.
+# Layouts of the .aco file header (version and color count) and of each
+# swatch (color space, four color values and name length). .aco files are
+# in big-endian order, which struct decodes regardless of the host's.
+_HEADER: struct.Struct = struct.Struct('>HH')
+_SWATCH: struct.Struct = struct.Struct('>HHHHHI')
 
-
-    #### Parameters
-    * file: BytesIO
-      * input stream from a file from which to read
-
-
-    #### Returns
-    * int
-      * the 16-bit unsigned integer as an int
-
-    """
-    # Read two bytes from the file; .aco files are in big-endian order,
-    # so we need to check whether or not we need to flip the bits.
-    _c: bytes = file.read(2)
-    if (sys.byteorder == 'little'):
-      _c = _c[::-1]
-    # Convert the read bytes straight to an integer.
-    _v: c_uint16 = c_uint16(0)
-    memmove(pointer(_v), _c, sizeof(c_uint16))
-    return _v.value
-
-def read_int16(file: BytesIO) -> int:
-    """ Reads a signed 16-bit integer from `file` and returns it as
-    an int.
-
-
-    #### Parameters
-    * file: BytesIO
-      * input stream from a file from which to read
-
-
-    #### Returns
-    * int
-      * the signed 16-bit integer as an int
-
-    """
-    # Read two bytes from the file; .aco files are in big-endian order,
-    # so we need to check whether or not we need to flip the bits.
-    _c: bytes = file.read(2)
-    if (sys.byteorder == 'little'):
-      _c = _c[::-1]
-    # Convert the read bytes straight to an integer.
-    _v: c_int16 = c_int16(0)
-    memmove(pointer(_v), _c, sizeof(c_int16))
-    return _v.value
-
-
-def read_uint32(file: BytesIO) -> int:
-    """ Reads an unsigned 32-bit integer from `file` and returns it as
-    an int.
-
-
-    #### Parameters
-
-    * file: BytesIO
-        * input stream from a file from which to read
-
-
-    #### Returns
-
-    * int
-      * the 32-bit integer as an int
-
-    """
-    # Read two bytes from the file; .aco files are in big-endian order,
-    # so we need to check whether or not we need to flip the bits.
-    _c: bytes = file.read(4)
-    if (sys.byteorder == 'little'):
-      _c = _c[::-1]
-    # Convert the read bytes straight to an integer.
-    _v: c_uint32 = c_uint32(0)
-    memmove(pointer(_v), _c, sizeof(c_uint16))
-    return _v.value
-
-
-def read_string(file: BytesIO, length: int) -> str:
-    """ Reads a string from `file` of size `length` and returns it.
-
-
-    #### Parameters
-
-    * file: BytesIO
-      * input stream from a file from which to read
-
-    * length: int
-      * length of string in bytes
-
-
-    #### Returns
-
-    * str
-      * the next string of `length` length from `file`
-
-    """
-    _r: str = ''
-    for _ in range(length):
-        _r += file.read(2).decode()
-    return _r.replace('\0', '')
+# Factors that scale the raw values of each color space into their usual
+# ranges, applied element-wise in a single map() call. They are stored as
+# reciprocals so that converting a value is a multiplication rather than
+# a division.
+_RGB_SCALES: Tuple[float, ...] = (1 / 256, 1 / 256, 1 / 256)
+_HSB_SCALES: Tuple[float, ...] = (1 / 182.04, 1 / 655.35, 1 / 655.35)
+_CMYK_SCALES: Tuple[float, ...] = (1 / 655.35, 1 / 655.35, 1 / 655.35, 1 / 655.35)
+_LAB_SCALES: Tuple[float, ...] = (1 / 100, 1 / 100, 1 / 100)
 
 
 def get_rgb(values: list[int]) -> list[float]:
@@ -147,7 +60,7 @@ def get_rgb(values: list[int]) -> list[float]:
 
     * values: list[int]
       * a list containing a minimum of 3 values
-      * it is assumed that all values are retrieved via read_int16
+      * it is assumed that all values are read by read_swatches
 
 
     #### Returns
@@ -159,7 +72,7 @@ def get_rgb(values: list[int]) -> list[float]:
         err: str = 'Too few values provided for RGB conversion.\n    '
         err += f'Got {len(values)}, should be at least 3.'
         raise ValueError(err)
-    return [(v / 256) for v in values[:3]]
+    return list(map(mul, values, _RGB_SCALES))
 
 
 def get_hsb(values: list[int]) -> list[float]:
@@ -170,7 +83,7 @@ def get_hsb(values: list[int]) -> list[float]:
 
     * values: list[int]
       * a list containing a minimum of 3 values
-      * it is assumed that all values are retrieved via read_int16
+      * it is assumed that all values are read by read_swatches
 
 
     #### Returns
@@ -182,7 +95,7 @@ def get_hsb(values: list[int]) -> list[float]:
         err: str = 'Too few values provided for HSB conversion.\n    '
         err += f'Got {len(values)}, should be at least 3.'
         raise ValueError(err)
-    return [values[0] / 182.04, values[1] / 655.35, values[2] / 655.35]
+    return list(map(mul, values, _HSB_SCALES))
 
 
 def get_cmyk(values: list[int]) -> list[float]:
@@ -193,7 +106,7 @@ def get_cmyk(values: list[int]) -> list[float]:
 
     * values: list[int]
       * a list containing a minimum of 4 values
-      * it is assumed that all values are retrieved via read_int16
+      * it is assumed that all values are read by read_swatches
 
 
     #### Returns
@@ -205,7 +118,7 @@ def get_cmyk(values: list[int]) -> list[float]:
         err: str = 'Too few values provided for CMYK conversion.\n    '
         err += f'Got {len(values)}, should be at least 4.'
         raise ValueError(err)
-    return [v / 655.35 for v in values]
+    return list(map(mul, values, _CMYK_SCALES))
 
 
 def get_lab(values: list[int]) -> list[float]:
@@ -216,7 +129,9 @@ def get_lab(values: list[int]) -> list[float]:
 
     * values: list[int]
       * a list containing a minimum of 3 values
-      * it is assumed that all values are retrieved via read_int16
+      * it is assumed that all values are read by read_swatches
+      * the a and b values may be either signed or raw unsigned 16-bit
+        values
 
 
     #### Returns
@@ -228,7 +143,24 @@ def get_lab(values: list[int]) -> list[float]:
         err: str = 'Too few values provided for LAB conversion.\n    '
         err += f'Got {len(values)}, should be at least 3.'
         raise ValueError(err)
-    return [v / 100 for v in values[:3]]
+    # LAB uses signed a and b values, but every color space is read as
+    # unsigned, so sign-extend just those two here without branching.
+    # Masking first means already signed values come through unchanged.
+    return list(map(mul, (
+        values[0],
+        ((values[1] & 0xFFFF) ^ 0x8000) - 0x8000,
+        ((values[2] & 0xFFFF) ^ 0x8000) - 0x8000
+    ), _LAB_SCALES))
+
+
+# Output template and converter for each supported color space, keyed
+# by the color space's id in the .aco file.
+_COLOR_SPACES: Dict[int, Tuple[str, Callable[[list[int]], list[float]]]] = {
+    0: ('RGB, %.2f, %.2f, %.2f', get_rgb),
+    1: ('HSB, %.2f, %.2f, %.2f', get_hsb),
+    2: ('CMYK, %.2f, %.2f, %.2f, %.2f', get_cmyk),
+    7: ('LAB, %.2f, %.2f, %.2f', get_lab)
+}
 
 
 def interpret_colors(color_space: int, values: list[int]) -> str:
@@ -257,64 +189,55 @@ def interpret_colors(color_space: int, values: list[int]) -> str:
         err: str = 'Too few values provided to interpret color values.'
         err += f'\n    Got {len(values)}, should be at least 3.'
         raise ValueError(err)
-    _col: list[float] = []
-    _l: str = ''
-    if color_space == 0:
-        _l = 'RGB'
-        _col.extend(get_rgb(values))
-    elif color_space == 1:
-        _l = 'HSB'
-        _col.extend(get_hsb(values))
-    elif color_space == 2:
-        _l = 'CMYK'
-        _col.extend(get_cmyk(values))
-    elif color_space == 7:
-        _l = 'LAB'
-        _col.extend(get_lab(values))
-    else:
+    _cs: Optional[Tuple[str, Callable[[list[int]], list[float]]]] = _COLOR_SPACES.get(color_space)
+    if (_cs is None):
         raise ValueError(f"Unhandled color space. color_space = {color_space}")
-    return _l + ', ' + ', '.join([f'{c:.2f}' for c in _col])
+    _fmt, _get = _cs
+    return _fmt % tuple(_get(values))
 
 
-def read_color_values(file: BytesIO) -> str:
-    """ Reads the color values from `file`, interprets them, and returns
-    a string that can be written to a file.
+def read_swatches(data: memoryview, offset: int, count: int) -> Iterator[Tuple[memoryview, int, list[int]]]:
+    """ Reads `count` color swatches from `data`, starting at `offset`,
+    and yields them one at a time.
 
 
     #### Parameters
 
-    * file: BytesIO
-      * input stream from a file from which to read the next color
-        values
+    * data: memoryview
+      * view over the entire contents of an .aco file
 
+    * offset: int
+      * offset in bytes at which the first color swatch begins
+
+    * count: int
+      * number of color swatches to read
 
-    #### Returns
 
-    * str
-      * a string to be written to a text file containing the interpreted
-        value for the next color value
+    #### Yields
+
+    * Tuple[memoryview, int, list[int]]
+      * the swatch's raw big-endian UTF-16 name, its color space, and
+        its raw color values
 
     """
-    color_space: int = read_uint16(file)
-    c_val_0: int = read_uint16(file)
-    # Check for the color space, as some will need signed values, and
-    # others use unsigned.
-    c_val_1: int = 0
-    c_val_2: int = 0
-    c_val_3: int = 0
-    if (color_space == 7):
-        # LAB color space uses signed integer values.
-        c_val_1 = read_int16(file)
-        c_val_2 = read_int16(file)
-        c_val_3 = read_int16(file)
-    else:
-        c_val_1 = read_uint16(file)
-        c_val_2 = read_uint16(file)
-        c_val_3 = read_uint16(file)
-    n_len: int = read_uint32(file)
-    s_name: str = read_string(file, n_len)
-    col: str = interpret_colors(color_space, [c_val_0, c_val_1, c_val_2, c_val_3])
-    return s_name + ", " + col + "\n"
+    # The whole file is decoded in this one loop, so bind the lookups it
+    # makes for every swatch to locals up front.
+    unpack_from = _SWATCH.unpack_from
+    swatch_size: int = _SWATCH.size
+    for _ in range(count):
+        color_space, c_val_0, c_val_1, c_val_2, c_val_3, n_len = unpack_from(data, offset)
+        offset += swatch_size
+        # Names are stored as UTF-16 code units, including the terminator.
+        # They are left for the caller to decode, so that a bad name only
+        # fails its own swatch.
+        end: int = offset + n_len * 2
+        if (end > len(data)):
+            # Report a name cut off by the end of the file the same way
+            # struct reports a cut off header.
+            raise struct.error(f'The file ends partway through a swatch name.\noffset = {offset}')
+        s_name: memoryview = data[offset:end]
+        offset = end
+        yield s_name, color_space, [c_val_0, c_val_1, c_val_2, c_val_3]
 
 
 def read_file(filename: str, xargs: Optional[dict] = None) -> None:
@@ -327,46 +250,107 @@ def read_file(filename: str, xargs: Optional[dict] = None) -> None:
     * filename: str
       * the path to the target .aco file to read
 
-    * args: Optional[dict]
+    * xargs: Optional[dict]
       * a dictionary containing optional arguments
+      * any argument left out falls back to its default, which reads
+        from and writes to the current directory
 
     """
-    if (os.path.sep == xargs['input_directory'][-1]):
-        filename = xargs['input_directory'] + filename
-    else:
-        filename = xargs['input_directory'] + os.sep + filename
-    _f: BytesIO = open(filename, 'rb')
-    verbose: bool = xargs['verbose']
-    fail_quiet: bool = xargs['fail_quiet']
-    # Check the file version.
-    version: int = read_uint16(_f)
+    # Resolve everything that stays the same for the whole file up front.
+    if (xargs is None):
+        xargs = {}
+    verbose: bool = xargs.get('verbose', False)
+    fail_quiet: bool = xargs.get('fail_quiet', False)
+    filename = os.path.join(xargs.get('input_directory', '.'), filename)
+    # The output file shares the input file's name, but not its directory.
+    out_path: str = os.path.join(
+        xargs.get('output_directory', '.'),
+        os.path.splitext(os.path.basename(filename))[0] + '.txt'
+    )
+    # Read the whole file up front and parse it straight out of memory.
+    with open(filename, 'rb') as _f:
+        data: memoryview = memoryview(_f.read())
+    # Check the file is long enough to hold a header at all.
+    if (len(data) < _HEADER.size):
+        if (not fail_quiet):
+            raise ValueError(f"This file is too short to be an .aco file.\nsize = {len(data)}")
+        else:
+            return
+    # Check the file version and get the color count.
+    version, color_count = _HEADER.unpack_from(data, 0)
     if (version != 2):
         if (not fail_quiet):
             raise ValueError(f"This script is currently unable to process .aco files of any version other than 2.\nversion = {version}")
         else:
             return
-    # Get color count.
-    color_count: int = read_uint16(_f)
     if (verbose):
         print(f"Reading {color_count} colors from '{filename}' ...")
     # Process all of the colors.
     if (fail_quiet):
         fail_count: int = 0
-    for _ in range(color_count):
+    lines: list[str] = []
+    swatches: Iterator[Tuple[memoryview, int, list[int]]] = read_swatches(
+        data, _HEADER.size, color_count
+    )
+    for i in range(color_count):
         try:
-            _wr: str = read_color_values(_f)
-        except ValueError as ex:
+            s_name, color_space, values = next(swatches)
+            # Decode the name in one go straight from the buffer.
+            lines.append(
+                str(s_name, 'utf-16-be').rstrip('\0') + ', '
+                + interpret_colors(color_space, values) + '\n'
+            )
+        except ValueError:
             if (fail_quiet):
                 fail_count += 1
                 continue
             else:
-                raise ex
-        with open(
-          filename[:-4].replace(
-            xargs['input_directory'], xargs['output_directory']
-          ) + '.txt', 'a+', encoding=sys.getdefaultencoding()) as out:
-            out.write(_wr)
+                raise
+        except struct.error:
+            # The file ends partway through this swatch, so none of the
+            # remaining swatches can be read.
+            if (fail_quiet):
+                fail_count += color_count - i
+                break
+            else:
+                raise
+    # Write all of the interpreted colors out at once.
+    with open(out_path, 'w', encoding='utf-8') as out:
+        out.writelines(lines)
     if (verbose):
-        print(f"Finished reading '{filename}'. Results saved in '{filename[:-4]}.txt'.")
+        print(f"Finished reading '{filename}'. Results saved in '{out_path}'.")
         if (fail_quiet):
             print(f'Failed to interpret {fail_count} swatches.')
+
+
+def read_files(filenames: list[str], xargs: Optional[dict] = None, workers: Optional[int] = None) -> None:
+    """ Reads each of the files indicated by `filenames` and writes the
+    interpreted data for each to its own text file.
+
+
+    #### Parameters
+
+    * filenames: list[str]
+      * the paths to the target .aco files to read
+
+    * xargs: Optional[dict]
+      * a dictionary containing optional arguments
+
+    * workers: Optional[int]
+      * the number of processes to read the files with
+      * defaults to the number of CPUs on the machine
+      * never more than the number of files
+
+    """
+    if (len(filenames) < 2):
+        # Not worth the cost of starting up a process pool.
+        for _f in filenames:
+            read_file(_f, xargs=xargs)
+        return
+    # Each file is independent, so spread them across separate processes,
+    # handing each one a few files at a time. There is no use in starting
+    # more processes than there are files.
+    workers = min(workers or os.cpu_count() or 1, len(filenames))
+    chunksize: int = max(1, len(filenames) // (workers * 4))
+    with ProcessPoolExecutor(workers) as executor:
+        list(executor.map(partial(read_file, xargs=xargs), filenames, chunksize=chunksize))